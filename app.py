@@ -1,50 +1,230 @@
+# eventlet的猴子补丁必须在导入其他模块之前完成
+import eventlet
+eventlet.monkey_patch()
+
 from flask import Flask, render_template, request, jsonify, make_response, redirect, url_for
 from flask_socketio import SocketIO, emit, join_room, leave_room
-import json
+import heapq
 import os
+import re
+import time
 import uuid
+import zlib
+from functools import lru_cache
 import logging
 from datetime import datetime
 
+import msgspec
+from socketio import RedisManager
+
+import orjson_json
+from storage import MemoryStore, RedisStore
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('amazing_chat')
 
 app = Flask(__name__)
+# 使用orjson替换标准库json，加速jsonify
+app.json = orjson_json.OrjsonProvider(app)
 # 使用环境变量或安全的密钥
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'amazing-chat-secret-key')
+# 配置了Redis时，多个worker通过Redis共享消息广播和聊天室状态
+REDIS_URL = os.environ.get('REDIS_URL')
 # 配置Socket.IO
 socketio = SocketIO(
     app, 
+    # 使用eventlet协程处理WebSocket连接
+    async_mode='eventlet',
     cors_allowed_origins="*",
     ping_timeout=60,
     ping_interval=25,
-    max_http_buffer_size=10 * 1024 * 1024
+    max_http_buffer_size=10 * 1024 * 1024,
+    # 使用orjson序列化Socket.IO消息
+    json=orjson_json,
+    # Redis消息队列也使用orjson，预编码的消息转发到其他worker时才能保持原样
+    client_manager=RedisManager(REDIS_URL, channel='flask-socketio', json=orjson_json) if REDIS_URL else None
 )
 
-# 存储在线用户信息
-online_users = {}
-# 存储聊天室消息历史
-chat_history = []
+# Socket.IO事件数据格式
+class JoinMessage(msgspec.Struct):
+    username: str
+
+class ChatMessage(msgspec.Struct):
+    username: str
+    message: str
+
+class LeaveMessage(msgspec.Struct):
+    username: str
+
+# 用户名中不允许出现的字符（只保留字母、数字、下划线、空格和汉字）
+USERNAME_INVALID_CHARS = re.compile(r'[^\w \u4e00-\u9fa5]')
+
+# 消息中需要删除的控制字符（保留换行和制表符，支持多行消息）
+MESSAGE_CONTROL_CHARS = dict.fromkeys(c for c in range(0x20) if c not in (0x09, 0x0a))
+MESSAGE_CONTROL_CHARS[0x7f] = None
+
+# 内容固定的提示消息，每种只编码一次
+@lru_cache(maxsize=None)
+def notice(message):
+    return orjson_json.Fragment(orjson_json.dumpb({'message': message}))
+
+# 消息时间戳精确到秒，同一秒内复用已格式化的字符串
+timestamp_cache = [0, '']
+
+def now_hms():
+    now = int(time.time())
+    cache = timestamp_cache
+    if cache[0] != now:
+        cache[0] = now
+        cache[1] = time.strftime('%H:%M:%S', time.localtime(now))
+    return cache[1]
+
+# 存储在线用户信息和聊天室消息历史（最多保留100条）
+store = RedisStore(REDIS_URL) if REDIS_URL else MemoryStore()
+# 启动时清理已退出的worker遗留的在线用户
+for username in store.remove_dead_sessions():
+    logger.info(f'清理已退出进程的会话: {username}')
+
+# 会话超过该时间没有活动时检查是否仍然连接，用于清理没有触发disconnect的半开连接
+SESSION_TTL = 300
+REAP_INTERVAL = 30
+# 本进程会话的过期堆：(过期时间, 会话ID, 用户名)
+# 过期时间更新后旧条目仍留在堆中，弹出时与session_expiry比对后忽略
+session_expiry_heap = []
+# 会话ID -> 最新的过期时间
+session_expiry = {}
+
+def touch_session(sid, username):
+    expires_at = time.time() + SESSION_TTL
+    session_expiry[sid] = expires_at
+    heapq.heappush(session_expiry_heap, (expires_at, sid, username))
+
+def reap_expired_sessions():
+    while True:
+        socketio.sleep(REAP_INTERVAL)
+        try:
+            # 刷新本进程的存活标记
+            store.heartbeat()
+            now = time.time()
+            while session_expiry_heap and session_expiry_heap[0][0] <= now:
+                expires_at, sid, username = heapq.heappop(session_expiry_heap)
+                if session_expiry.get(sid) != expires_at:
+                    continue
+                # 连接仍然有效（只是用户没有发言），续期即可
+                if socketio.server.manager.is_connected(sid, '/'):
+                    touch_session(sid, username)
+                    continue
+                del session_expiry[sid]
+                if store.remove_sid(sid):
+                    logger.info(f'清理失效会话: {username} (会话ID: {sid})')
+                    socketio.emit('user_left', {
+                        'username': username,
+                        'users': store.usernames()
+                    })
+            # 其他worker退出后遗留的会话不在本进程的堆中，按存活标记清理
+            for username in store.remove_dead_sessions():
+                logger.info(f'清理已退出进程的会话: {username}')
+                socketio.emit('user_left', {
+                    'username': username,
+                    'users': store.usernames()
+                })
+        except Exception as e:
+            logger.error(f'清理失效会话失败: {str(e)}')
+
+socketio.start_background_task(reap_expired_sessions)
+
+# 配置文件格式
+class Server(msgspec.Struct, frozen=True):
+    name: str
+    url: str
+
+class Config(msgspec.Struct, frozen=True):
+    servers: tuple[Server, ...]
+
+DEFAULT_CONFIG = Config(servers=(Server(name='本地服务器', url='http://localhost:5000'),))
 
 # 加载配置文件
 def load_config():
     try:
         config_path = 'config.json'
         if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"servers": [{"name": "本地服务器", "url": "http://localhost:5000"}]}
+            with open(config_path, 'rb') as f:
+                return msgspec.json.decode(f.read(), type=Config)
+        return DEFAULT_CONFIG
     except Exception as e:
         logger.error(f'加载配置文件失败: {str(e)}')
-        return {"servers": [{"name": "本地服务器", "url": "http://localhost:5000"}]}
+        return DEFAULT_CONFIG
 
 config = load_config()
 
+# 川小农的问答规则：(关键词, 回复)，按优先级排列，同时命中多类时取靠前的一类
+AI_REPLIES = (
+    # 自我介绍相关
+    (('你是谁', '你是', '介绍', '名字', '小美'),
+     '你好~我是川小农，是这个Amazing聊天室专属的AI助手，小名叫小美！我是四川农业大学的AI小助手，性别是女。我的主要功能是接收用户提问，回答与四川农业大学有关的问题。有任何关于川农大的问题都可以随时问我哦！'),
+    # 学校地址
+    (('在哪里', '地址'),
+     '四川农业大学有三个校区：雅安校区位于四川省雅安市雨城区新康路46号；成都校区位于成都市温江区惠民路211号；都江堰校区位于成都市都江堰市建设路288号。'),
+    # 四川农业大学基本信息
+    (('川农大', '四川农业大学', '学校'),
+     '四川农业大学是国家"双一流"建设高校，也是国家"211工程"重点建设大学。学校有雅安、成都和都江堰三个校区，学科涵盖农学、理学、工学、经济学、管理学等多个领域。'),
+    # 专业相关问题
+    (('专业', '学科', '学院'),
+     '四川农业大学设有农学院、动物科技学院、林学院、园艺学院、资源学院等多个学院。优势学科包括作物学、畜牧学、兽医学、林学、农林经济管理等。学校有多个国家级和省级重点学科。'),
+    # 历史相关问题
+    (('历史', '成立', '创建', '多少年'),
+     '四川农业大学前身是1906年创办的四川通省农业学堂，1935年成为省立四川大学农学院，1956年迁至雅安独立建校为四川农学院，1985年更名为四川农业大学。学校至今已有一百多年的办学历史。'),
+    # 校园生活相关
+    (('生活', '宿舍', '食堂', '校园'),
+     '四川农业大学各校区环境优美，设施完善。学生宿舍提供良好的住宿条件，配有空调、独立卫生间等设施。学校食堂菜品丰富多样，能够满足不同学生的饮食需求。校园内还有图书馆、体育馆、实验室等各类学习和生活设施。'),
+    # 招生相关
+    (('招生', '分数线', '报考', '录取'),
+     '四川农业大学每年面向全国招生，具体的招生计划、分数线和报考要求可以关注学校官方网站或招生办公室发布的最新信息。学校提供本科、硕士、博士等多层次的教育项目。'),
+)
+
+# 关键词 -> 类别位掩码（第n类对应1 << n）
+AI_KEYWORD_MASKS = {
+    keyword: 1 << category
+    for category, (keywords, _) in enumerate(AI_REPLIES)
+    for keyword in keywords
+}
+# 所有关键词合并为一个正则，前瞻断言允许重叠匹配，一次扫描即可找出全部命中的关键词
+AI_KEYWORD_PATTERN = re.compile(
+    '(?=(%s))' % '|'.join(map(re.escape, AI_KEYWORD_MASKS))
+)
+
+# 预先编码好的回复消息，发送时只需把占位符替换成时间戳
+AI_TIMESTAMP_PLACEHOLDER = b'@@TIMESTAMP@@'
+AI_RESPONSE_TEMPLATES = tuple(
+    orjson_json.dumpb({
+        'type': 'ai_reply',
+        'username': '川小农',
+        'message': message,
+        'timestamp': AI_TIMESTAMP_PLACEHOLDER.decode('ascii')
+    })
+    for _, message in AI_REPLIES
+)
+
+def match_ai_category(question):
+    # 汇总命中的类别，最低位即优先级最高的类别
+    mask = 0
+    for keyword in AI_KEYWORD_PATTERN.findall(question):
+        mask |= AI_KEYWORD_MASKS[keyword]
+    if not mask:
+        return None
+    return (mask & -mask).bit_length() - 1
+
+# 登录页面只依赖固定的服务器列表，渲染一次后缓存
+index_html = None
+
 @app.route('/')
 def index():
+    global index_html
     try:
-        return render_template('login.html', servers=config['servers'])
+        if index_html is None:
+            index_html = render_template('login.html', servers=config.servers)
+        return make_response(index_html)
     except Exception as e:
         logger.error(f'渲染登录页面失败: {str(e)}')
         return make_response('服务器内部错误', 500)
@@ -60,8 +240,7 @@ def chat():
             return redirect(url_for('index'))
         
         # 限制用户名长度和清理特殊字符
-        username = username.strip()[:30]
-        username = ''.join(c for c in username if c.isalnum() or c in ' _\u4e00-\u9fa5')
+        username = USERNAME_INVALID_CHARS.sub('', username.strip()[:30])
         
         return render_template('chat.html', username=username, server=server)
     except Exception as e:
@@ -79,13 +258,21 @@ def check_username():
             username = request.args.get('username', '')
         
         username = username.strip()
-        is_taken = username in online_users
         
-        return jsonify({
-            'taken': is_taken,
-            'available': not is_taken,
-            'message': '用户名可用' if not is_taken else '用户名已被使用'
-        })
+        # 在线用户没有变动时结果不变，轮询的客户端可直接使用缓存
+        etag = f'{zlib.crc32(username.encode("utf-8"))}-{store.get_users_tag()}'
+        if request.method == 'GET' and request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            is_taken = store.get_user(username) is not None
+            response = jsonify({
+                'taken': is_taken,
+                'available': not is_taken,
+                'message': '用户名可用' if not is_taken else '用户名已被使用'
+            })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         logger.error(f'检查用户名失败: {str(e)}')
         return jsonify({'taken': False, 'error': '服务器错误'}), 500
@@ -95,7 +282,7 @@ def handle_connect():
     try:
         logger.info(f'客户端连接: {request.sid}')
         # 发送连接确认
-        emit('connect_ack', {'message': '连接成功'})
+        emit('connect_ack', notice('连接成功'))
     except Exception as e:
         logger.error(f'处理连接事件失败: {str(e)}')
 
@@ -106,20 +293,16 @@ def handle_disconnect():
         logger.info(f'客户端断开连接: {sid}')
         
         # 查找断开连接的用户
-        username_to_remove = None
-        for username, user_info in online_users.items():
-            if user_info['sid'] == sid:
-                username_to_remove = username
-                break
+        session_expiry.pop(sid, None)
+        username_to_remove = store.remove_sid(sid)
         
         if username_to_remove:
-            del online_users[username_to_remove]
             logger.info(f'用户离开: {username_to_remove}')
             # 通知其他用户有用户离开
             try:
                 emit('user_left', {
                     'username': username_to_remove, 
-                    'users': list(online_users.keys())
+                    'users': store.usernames()
                 }, broadcast=True, include_self=False)
             except Exception as emit_error:
                 logger.error(f'发送用户离开通知失败: {str(emit_error)}')
@@ -130,40 +313,43 @@ def handle_disconnect():
 def handle_join(data):
     try:
         # 验证数据格式
-        if not isinstance(data, dict) or 'username' not in data:
+        try:
+            username = msgspec.convert(data, JoinMessage).username
+        except msgspec.ValidationError:
             logger.error('加入事件数据格式错误')
-            emit('error', {'message': '无效的加入请求'})
+            emit('error', notice('无效的加入请求'))
             return
         
-        username = data['username']
         sid = request.sid
         
         # 验证用户名
-        if not username or not isinstance(username, str) or len(username.strip()) == 0:
+        if not username.strip():
             logger.warning('无效的用户名')
-            emit('error', {'message': '用户名不能为空'})
+            emit('error', notice('用户名不能为空'))
             return
         
         # 清理用户名
-        username = username.strip()[:30]
-        username = ''.join(c for c in username if c.isalnum() or c in ' _\u4e00-\u9fa5')
+        username = USERNAME_INVALID_CHARS.sub('', username.strip()[:30])
         
         # 检查用户名是否已存在
-        if username in online_users:
+        existing_user = store.get_user(username)
+        if existing_user is not None:
             # 如果是同一个客户端重新加入，更新会话ID
-            if online_users[username]['sid'] != sid:
+            if existing_user['sid'] != sid:
                 logger.info(f'用户重新加入: {username} (新会话ID: {sid})')
                 # 通知旧会话已被挤下线
-                old_sid = online_users[username]['sid']
-                emit('kicked', {'message': '您的账号在其他地方登录'}, room=old_sid)
+                old_sid = existing_user['sid']
+                session_expiry.pop(old_sid, None)
+                emit('kicked', notice('您的账号在其他地方登录'), room=old_sid)
             else:
                 logger.warning(f'用户重复加入: {username}')
         
         # 存储用户信息
-        online_users[username] = {
+        store.add_user(username, {
             'sid': sid,
             'joined_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        })
+        touch_session(sid, username)
         
         logger.info(f'用户加入: {username} (会话ID: {sid})')
         
@@ -174,19 +360,15 @@ def handle_join(data):
         welcome_msg = {
             'type': 'system',
             'message': f'欢迎 {username} 加入聊天室！',
-            'timestamp': datetime.now().strftime('%H:%M:%S')
+            'timestamp': now_hms()
         }
         
         # 添加系统消息到历史
-        with socketio.lock:
-            chat_history.append(welcome_msg)
-            # 限制历史记录长度
-            if len(chat_history) > 100:
-                chat_history.pop(0)
+        store.append_history(orjson_json.dumpb(welcome_msg))
         
-        # 发送历史消息给新用户
+        # 发送历史消息给新用户（历史记录已是编码好的JSON，直接拼接）
         try:
-            emit('history', {'messages': chat_history})
+            emit('history', orjson_json.Fragment(b'{"messages":[' + b','.join(store.get_history()) + b']}'))
         except Exception as emit_error:
             logger.error(f'发送历史消息失败: {str(emit_error)}')
         
@@ -194,7 +376,7 @@ def handle_join(data):
         try:
             emit('user_joined', {
                 'username': username,
-                'users': list(online_users.keys()),
+                'users': store.usernames(),
                 'message': welcome_msg
             }, broadcast=True)
         except Exception as emit_error:
@@ -203,7 +385,7 @@ def handle_join(data):
     except Exception as e:
         logger.error(f'处理加入事件失败: {str(e)}')
         try:
-            emit('error', {'message': '加入聊天室失败'})
+            emit('error', notice('加入聊天室失败'))
         except:
             pass
 
@@ -211,27 +393,28 @@ def handle_join(data):
 def handle_message(data):
     try:
         # 验证数据格式
-        if not isinstance(data, dict) or 'username' not in data or 'message' not in data:
+        try:
+            chat_message = msgspec.convert(data, ChatMessage)
+        except msgspec.ValidationError:
             logger.error('消息数据格式错误')
             return
         
-        username = data['username']
-        message = data['message']
+        username = chat_message.username
+        message = chat_message.message
         
         # 验证用户是否在线
-        if username not in online_users:
+        if store.get_user(username) is None:
             logger.warning(f'未授权的消息发送尝试: {username}')
             try:
-                emit('error', {'message': '请先加入聊天室'})
+                emit('error', notice('请先加入聊天室'))
             except:
                 pass
             return
         
-        # 验证消息内容
-        if not message or not isinstance(message, str):
-            return
+        touch_session(request.sid, username)
         
-        message = message.strip()
+        # 验证消息内容，同时去掉控制字符
+        message = message.translate(MESSAGE_CONTROL_CHARS).strip()
         if not message:
             return
         
@@ -239,7 +422,7 @@ def handle_message(data):
         if len(message) > 500:
             message = message[:500] + '...'
             
-        timestamp = datetime.now().strftime('%H:%M:%S')
+        timestamp = now_hms()
         
         # 处理特殊命令
         message_type = 'text'
@@ -270,56 +453,27 @@ def handle_message(data):
                     # 四川农业大学AI助手回复逻辑
                     question = parts[1].strip()
                     
-                    # 初始化AI回复
-                    ai_response_message = ''
-                    
-                    # 1. 自我介绍相关
-                    if any(keyword in question for keyword in ['你是谁', '你是', '介绍', '名字', '小美']):
-                        ai_response_message = '你好~我是川小农，是这个Amazing聊天室专属的AI助手，小名叫小美！我是四川农业大学的AI小助手，性别是女。我的主要功能是接收用户提问，回答与四川农业大学有关的问题。有任何关于川农大的问题都可以随时问我哦！'
-                    
-                    # 2. 四川农业大学基本信息
-                    elif any(keyword in question for keyword in ['川农大', '四川农业大学', '学校', '在哪里', '地址']):
-                        if '地址' in question or '在哪里' in question:
-                            ai_response_message = '四川农业大学有三个校区：雅安校区位于四川省雅安市雨城区新康路46号；成都校区位于成都市温江区惠民路211号；都江堰校区位于成都市都江堰市建设路288号。'
-                        else:
-                            ai_response_message = '四川农业大学是国家"双一流"建设高校，也是国家"211工程"重点建设大学。学校有雅安、成都和都江堰三个校区，学科涵盖农学、理学、工学、经济学、管理学等多个领域。'
-                    
-                    # 3. 专业相关问题
-                    elif any(keyword in question for keyword in ['专业', '学科', '学院']):
-                        ai_response_message = '四川农业大学设有农学院、动物科技学院、林学院、园艺学院、资源学院等多个学院。优势学科包括作物学、畜牧学、兽医学、林学、农林经济管理等。学校有多个国家级和省级重点学科。'
-                    
-                    # 4. 历史相关问题
-                    elif any(keyword in question for keyword in ['历史', '成立', '创建', '多少年']):
-                        ai_response_message = '四川农业大学前身是1906年创办的四川通省农业学堂，1935年成为省立四川大学农学院，1956年迁至雅安独立建校为四川农学院，1985年更名为四川农业大学。学校至今已有一百多年的办学历史。'
-                    
-                    # 5. 校园生活相关
-                    elif any(keyword in question for keyword in ['生活', '宿舍', '食堂', '校园']):
-                        ai_response_message = '四川农业大学各校区环境优美，设施完善。学生宿舍提供良好的住宿条件，配有空调、独立卫生间等设施。学校食堂菜品丰富多样，能够满足不同学生的饮食需求。校园内还有图书馆、体育馆、实验室等各类学习和生活设施。'
+                    category = match_ai_category(question)
                     
-                    # 6. 招生相关
-                    elif any(keyword in question for keyword in ['招生', '分数线', '报考', '录取']):
-                        ai_response_message = '四川农业大学每年面向全国招生，具体的招生计划、分数线和报考要求可以关注学校官方网站或招生办公室发布的最新信息。学校提供本科、硕士、博士等多层次的教育项目。'
-                    
-                    # 7. 未匹配到相关问题时的回复
+                    # 编码一次，历史记录和广播共用
+                    if category is not None:
+                        ai_payload = AI_RESPONSE_TEMPLATES[category].replace(
+                            AI_TIMESTAMP_PLACEHOLDER, timestamp.encode('ascii'), 1
+                        )
                     else:
-                        ai_response_message = f'感谢你的提问！关于"{parts[1]}"，我还在学习中。不过我可以回答四川农业大学的相关问题，比如学校历史、专业设置、校园环境等。你有什么关于川农大的问题想问我吗？'
-                    
-                    ai_response = {
-                        'type': 'ai_reply',
-                        'username': '川小农',
-                        'message': ai_response_message,
-                        'timestamp': datetime.now().strftime('%H:%M:%S')
-                    }
+                        # 未匹配到相关问题时的回复
+                        ai_payload = orjson_json.dumpb({
+                            'type': 'ai_reply',
+                            'username': '川小农',
+                            'message': f'感谢你的提问！关于"{parts[1]}"，我还在学习中。不过我可以回答四川农业大学的相关问题，比如学校历史、专业设置、校园环境等。你有什么关于川农大的问题想问我吗？',
+                            'timestamp': timestamp
+                        })
                     
                     # 保存AI回复到历史
-                    with socketio.lock:
-                        chat_history.append(ai_response)
-                        # 限制历史记录长度
-                        if len(chat_history) > 100:
-                            chat_history.pop(0)
+                    store.append_history(ai_payload)
                     
                     # 广播AI回复
-                    emit('new_message', ai_response, broadcast=True, room='chat_room')
+                    emit('new_message', orjson_json.Fragment(ai_payload), broadcast=True, room='chat_room')
                 except Exception as ai_error:
                     logger.error(f'AI回复处理失败: {str(ai_error)}')
                     # 发送错误消息
@@ -342,23 +496,22 @@ def handle_message(data):
             'special_data': special_data
         }
         
+        # 编码一次，历史记录和广播共用
+        msg_payload = orjson_json.dumpb(msg_obj)
+        
         # 保存到历史记录
-        with socketio.lock:
-            chat_history.append(msg_obj)
-            # 限制历史记录长度
-            if len(chat_history) > 100:
-                chat_history.pop(0)
+        store.append_history(msg_payload)
         
         # 广播消息
         try:
-            emit('new_message', msg_obj, broadcast=True, room='chat_room')
+            emit('new_message', orjson_json.Fragment(msg_payload), broadcast=True, room='chat_room')
         except Exception as emit_error:
             logger.error(f'广播消息失败: {str(emit_error)}')
             
     except Exception as e:
         logger.error(f'处理消息事件失败: {str(e)}')
         try:
-            emit('error', {'message': '发送消息失败'})
+            emit('error', notice('发送消息失败'))
         except:
             pass
 
@@ -366,20 +519,22 @@ def handle_message(data):
 def handle_leave(data):
     try:
         # 验证数据格式
-        if not isinstance(data, dict) or 'username' not in data:
+        try:
+            username = msgspec.convert(data, LeaveMessage).username
+        except msgspec.ValidationError:
             logger.error('离开事件数据格式错误')
             return
         
-        username = data['username']
-        if username in online_users:
-            del online_users[username]
+        user_info = store.remove_user(username)
+        if user_info is not None:
+            session_expiry.pop(user_info['sid'], None)
             leave_room('chat_room')
             logger.info(f'用户主动离开: {username}')
             # 通知其他用户有用户离开
             try:
                 emit('user_left', {
                     'username': username,
-                    'users': list(online_users.keys())
+                    'users': store.usernames()
                 }, broadcast=True, include_self=False)
             except Exception as emit_error:
                 logger.error(f'发送用户离开通知失败: {str(emit_error)}')
@@ -391,8 +546,8 @@ def handle_leave(data):
 def health_check():
     return jsonify({
         'status': 'healthy',
-        'online_users': len(online_users),
-        'history_count': len(chat_history),
+        'online_users': store.user_count(),
+        'history_count': store.history_count(),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -411,7 +566,11 @@ if __name__ == '__main__':
         logger.info('启动Amazing聊天室服务器...')
         logger.info(f'服务器配置: {config}')
         # 监听所有接口，支持局域网访问
-        socketio.run(app, host='0.0.0.0', port=5000, debug=True)
+        # 生产环境可使用: gunicorn -k eventlet -w 1 app:app
+        # 多个worker时需设置REDIS_URL，例如 REDIS_URL=redis://localhost:6379/0
+        # 只有设置DEBUG=1时才开启调试模式和访问日志
+        debug = os.environ.get('DEBUG') == '1'
+        socketio.run(app, host='0.0.0.0', port=5000, debug=debug, log_output=debug)
     except KeyboardInterrupt:
         logger.info('服务器已停止')
     except Exception as e:
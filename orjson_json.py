@@ -0,0 +1,26 @@
+# 基于orjson的JSON序列化模块，供Socket.IO和Flask共用（需要orjson 3.9及以上）
+import orjson
+from flask.json.provider import JSONProvider
+
+
+def dumps(obj, **kwargs):
+    # orjson不支持标准库的额外参数（如separators），直接忽略
+    return orjson.dumps(obj).decode('utf-8')
+
+
+# 编码为bytes，用于历史记录等需要保存编码结果的地方
+dumpb = orjson.dumps
+
+# 预编码的JSON片段，orjson在任意嵌套位置都会原样嵌入，经Redis转发到其他worker时也不会被当成字符串
+Fragment = orjson.Fragment
+
+loads = orjson.loads
+
+
+class OrjsonProvider(JSONProvider):
+    # 让jsonify等Flask接口也使用orjson
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
@@ -0,0 +1,209 @@
+# 在线用户与聊天记录的存储
+# 单进程部署使用内存存储；多进程部署时使用Redis存储，让各个worker共享同一份数据
+import uuid
+from collections import deque
+
+import orjson_json
+
+
+class MemoryStore:
+    # 以下操作都不会让出eventlet协程，也就不会被其他事件处理打断，因此无需加锁
+    def __init__(self, history_size=100):
+        # 用户名 -> 用户信息
+        self.users = {}
+        # 会话ID -> 用户名的反向索引
+        self.sids = {}
+        # 在线用户每次变动时递增；计数器随进程重启归零，配合每次启动生成的epoch区分
+        self.users_version = 0
+        self.users_epoch = uuid.uuid4().hex
+        # 聊天记录（已编码的JSON bytes），超出容量时自动淘汰最旧的消息
+        self.history = deque(maxlen=history_size)
+
+    def get_user(self, username):
+        return self.users.get(username)
+
+    def add_user(self, username, info):
+        old_info = self.users.get(username)
+        if old_info is not None:
+            self.sids.pop(old_info['sid'], None)
+        self.users[username] = info
+        self.sids[info['sid']] = username
+        self.users_version += 1
+
+    def remove_user(self, username):
+        info = self.users.pop(username, None)
+        if info is not None:
+            self.sids.pop(info['sid'], None)
+            self.users_version += 1
+        return info
+
+    def remove_sid(self, sid):
+        # 返回该会话对应的用户名，没有则返回None
+        username = self.sids.pop(sid, None)
+        if username is not None:
+            self.users.pop(username, None)
+            self.users_version += 1
+        return username
+
+    def get_users_tag(self):
+        # 在线用户的版本标识，用户变动或进程重启后都会改变
+        return f'{self.users_epoch}-{self.users_version}'
+
+    def usernames(self):
+        return list(self.users)
+
+    def user_count(self):
+        return len(self.users)
+
+    def append_history(self, message):
+        self.history.append(message)
+
+    def get_history(self):
+        return list(self.history)
+
+    def history_count(self):
+        return len(self.history)
+
+    def heartbeat(self):
+        # 内存中的数据随进程一起消失，不需要存活标记
+        pass
+
+    def remove_dead_sessions(self):
+        return []
+
+
+# Redis中的用户变更用Lua脚本完成，读取和写入在同一个原子操作内，避免多个worker并发时留下孤立的会话记录
+# KEYS: 用户表、会话表、版本号
+ADD_USER_SCRIPT = """
+local old_info = redis.call('HGET', KEYS[1], ARGV[1])
+if old_info then
+    redis.call('HDEL', KEYS[2], cjson.decode(old_info)['sid'])
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[3], ARGV[1])
+return redis.call('INCR', KEYS[3])
+"""
+
+REMOVE_USER_SCRIPT = """
+local info = redis.call('HGET', KEYS[1], ARGV[1])
+if not info then
+    return false
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], cjson.decode(info)['sid'])
+redis.call('INCR', KEYS[3])
+return info
+"""
+
+# 用户可能已在其他会话重新登录，只删除仍属于该会话的记录
+REMOVE_SID_SCRIPT = """
+local username = redis.call('HGET', KEYS[2], ARGV[1])
+if not username then
+    return false
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+local info = redis.call('HGET', KEYS[1], username)
+if not info or cjson.decode(info)['sid'] ~= ARGV[1] then
+    return false
+end
+redis.call('HDEL', KEYS[1], username)
+redis.call('INCR', KEYS[3])
+return username
+"""
+
+
+class RedisStore:
+    # 每个worker在Redis中维护一个带过期时间的存活标记，worker退出或崩溃后标记过期，
+    # 它登记的在线用户会被其他worker清理，在线状态不会在重启后残留
+    def __init__(self, url, history_size=100, prefix='amazing:', host_ttl=90):
+        # 只有配置了Redis时才需要安装redis库
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.history_size = history_size
+        self.users_key = prefix + 'users'
+        self.sids_key = prefix + 'sids'
+        self.history_key = prefix + 'history'
+        self.users_version_key = prefix + 'users_version'
+        # 与版本号一起存放的epoch，键被清空后重新生成，避免版本号从头计数时与旧值重复
+        self.users_epoch_key = prefix + 'users_epoch'
+        self.user_keys = [self.users_key, self.sids_key, self.users_version_key]
+        self.host_key_prefix = prefix + 'host:'
+        self.host_id = uuid.uuid4().hex
+        self.host_ttl = host_ttl
+        self.add_user_script = self.redis.register_script(ADD_USER_SCRIPT)
+        self.remove_user_script = self.redis.register_script(REMOVE_USER_SCRIPT)
+        self.remove_sid_script = self.redis.register_script(REMOVE_SID_SCRIPT)
+        self.heartbeat()
+
+    def get_user(self, username):
+        info = self.redis.hget(self.users_key, username)
+        if info is None:
+            return None
+        return orjson_json.loads(info)
+
+    def add_user(self, username, info):
+        # 记录会话所在的worker，用于判断该会话是否已随worker失效
+        info = {**info, 'host': self.host_id}
+        self.add_user_script(keys=self.user_keys, args=[username, orjson_json.dumps(info), info['sid']])
+
+    def remove_user(self, username):
+        info = self.remove_user_script(keys=self.user_keys, args=[username])
+        if info is None:
+            return None
+        return orjson_json.loads(info)
+
+    def remove_sid(self, sid):
+        # 返回被删除的用户名；会话不存在或用户已换到其他会话时返回None
+        username = self.remove_sid_script(keys=self.user_keys, args=[sid])
+        if username is None:
+            return None
+        return username.decode('utf-8')
+
+    def get_users_tag(self):
+        epoch, version = self.redis.mget(self.users_epoch_key, self.users_version_key)
+        if epoch is None:
+            self.redis.set(self.users_epoch_key, uuid.uuid4().hex, nx=True)
+            epoch, version = self.redis.mget(self.users_epoch_key, self.users_version_key)
+        return f'{epoch.decode("utf-8")}-{int(version or 0)}'
+
+    def usernames(self):
+        return [name.decode('utf-8') for name in self.redis.hkeys(self.users_key)]
+
+    def user_count(self):
+        return self.redis.hlen(self.users_key)
+
+    def append_history(self, message):
+        # 新消息插入表头，并裁剪到固定长度
+        pipe = self.redis.pipeline()
+        pipe.lpush(self.history_key, message)
+        pipe.ltrim(self.history_key, 0, self.history_size - 1)
+        pipe.execute()
+
+    def get_history(self):
+        messages = self.redis.lrange(self.history_key, 0, self.history_size - 1)
+        messages.reverse()
+        return messages
+
+    def history_count(self):
+        return self.redis.llen(self.history_key)
+
+    def heartbeat(self):
+        # 需要在host_ttl内定期调用，否则本worker的用户会被当作失效清理
+        self.redis.set(self.host_key_prefix + self.host_id, 1, ex=self.host_ttl)
+
+    def remove_dead_sessions(self):
+        # 清理所在worker已失效的会话，返回被清理的用户名
+        infos = [orjson_json.loads(info) for info in self.redis.hvals(self.users_key)]
+        hosts = list({info.get('host') for info in infos} - {None})
+        pipe = self.redis.pipeline()
+        for host in hosts:
+            pipe.exists(self.host_key_prefix + host)
+        alive_hosts = {host for host, alive in zip(hosts, pipe.execute()) if alive}
+        removed = []
+        for info in infos:
+            if info.get('host') not in alive_hosts:
+                username = self.remove_sid(info['sid'])
+                if username is not None:
+                    removed.append(username)
+        return removed